@@ -6,4 +6,5 @@ load_dotenv()
 TELEGRAM_API_ID = os.getenv('TELEGRAM_API_ID')
 TELEGRAM_API_HASH = os.getenv('TELEGRAM_API_HASH')
 TELEGRAM_PHONE = os.getenv('TELEGRAM_PHONE')
-API_KEY = os.getenv('API_KEY')
\ No newline at end of file
+API_KEY = os.getenv('API_KEY')
+FILTER_RULES_PATH = os.getenv('FILTER_RULES_PATH')
\ No newline at end of file
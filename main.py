@@ -1,9 +1,11 @@
 import asyncio
 from src.ai_analyzer import AiAnalizer
-from config.settings import TELEGRAM_API_ID, TELEGRAM_API_HASH, TELEGRAM_PHONE, API_KEY
+from config.settings import TELEGRAM_API_ID, TELEGRAM_API_HASH, TELEGRAM_PHONE, API_KEY, FILTER_RULES_PATH
 from src.telegram_client import TelegramAnalyzer
 from src.message_analyzer import MessageProcessor
+from src.filter_rules import load_filter_rules
 from src.database import Database
+from src.exporter import ParquetExporter
 from datetime import datetime, timedelta
 
 def print_chat_history(recent_chats):
@@ -32,6 +34,7 @@ def print_conversation_analysis(conversation):
     print(f"   Загальна кількість повідомлень: {conversation.total_messages}")
     print(f"   Повідомлення менеджера: {conversation.manager_messages}")
     print(f"   Повідомлення клієнта: {conversation.client_messages}")
+    print(f"   Повтори шаблонних повідомлень: {conversation.duplicate_messages}")
     print(f"   Період розмови: {conversation.start_date.strftime('%Y-%m-%d')} - {conversation.end_date.strftime('%Y-%m-%d')}")
     
     if conversation.total_messages > 0:
@@ -54,11 +57,49 @@ def print_ai_analysis(ai_result):
         for p in ai_result['promises']:
             print(f"- {p.get('promise_text')} | Термін: {p.get('deadline')} | Виконано: {p.get('fulfilled')} | Причина: {p.get('reason')}")
 
+def print_filter_stats(stats):
+    """Виведення кількості повідомлень, відкинутих кожним правилом фільтрації"""
+    print(f"\n🧹 Фільтрація повідомлень: перевірено {stats['checked']}")
+    for rule_name, count in stats['dropped'].items():
+        if count:
+            print(f"   {rule_name}: {count}")
+
+def collect_promises(potential_promises, ai_result):
+    """Збір обіцянок для збереження: знайдені за ключовими словами та від AI"""
+    promises = []
+    for candidate in potential_promises:
+        msg = candidate['message']
+        for promise_text in candidate['extracted_promises']:
+            promises.append({
+                'message_id': msg.id,
+                'date': msg.date,
+                'from_me': msg.from_me,
+                'promise_text': promise_text,
+                'status': 'potential'
+            })
+
+    if ai_result:
+        for p in ai_result.get('promises') or []:
+            promises.append({
+                'date': p.get('date_promised'),
+                'from_me': True,
+                'promise_text': p.get('promise_text'),
+                'deadline': p.get('deadline'),
+                'status': 'fulfilled' if p.get('fulfilled') else 'unfulfilled'
+            })
+    return promises
+
 async def main():
     telegram = TelegramAnalyzer(TELEGRAM_API_ID, TELEGRAM_API_HASH, TELEGRAM_PHONE)
     ai_analyzer = AiAnalizer(API_KEY)
     db = Database()
-    processor = MessageProcessor()
+    filter_rules = load_filter_rules(FILTER_RULES_PATH) if FILTER_RULES_PATH else None
+    processor = MessageProcessor(filter_rules=filter_rules)
+    try:
+        exporter = ParquetExporter()
+    except ImportError as e:
+        print(f"Експорт у Parquet вимкнено: {e}")
+        exporter = None
 
     await telegram.connect()
     recent_chats = await telegram.get_recent_chats(limit=3)
@@ -72,24 +113,19 @@ async def main():
             continue
 
         print_messages(messages)
+        db.save_messages(messages)
 
         # Підготовка даних для AI через MessageProcessor
         conversation = processor.process_messages(messages)
         conversation.chat_name = chat['name']
         print_conversation_analysis(conversation)
 
-        # Підготовка повідомлень для AI (як список словників)
-        messages_for_ai = []
-        for msg in conversation.messages:
-            messages_for_ai.append({
-                "from_me": msg.from_me,
-                "date": msg.date,
-                "text": msg.text
-            })
+        # Підготовка тексту розмови для AI (повтори шаблонів замінені посиланнями)
+        ai_data = processor.prepare_for_ai_analysis(conversation)
 
         # AI аналіз розмови
         try:
-            ai_result = ai_analyzer.analyze_conversation(messages_for_ai)
+            ai_result = ai_analyzer.analyze_conversation(conversation_text=ai_data['conversation_text'])
             if not isinstance(ai_result, dict):
                 print("AI аналіз не повернув коректний результат.")
                 ai_result = None
@@ -99,6 +135,18 @@ async def main():
 
         print_ai_analysis(ai_result)
 
+        potential_promises = ai_data['potential_promises']
+        promises = collect_promises(potential_promises, ai_result)
+        db.save_promises(chat['id'], promises)
+
+        if exporter:
+            exporter.export_conversation(
+                conversation,
+                potential_promises,
+                ai_data['message_groups'],
+                promises
+            )
+
         # Запис результату AI аналізу в базу даних
         if ai_result:
             db.save_analysis(
@@ -108,6 +156,27 @@ async def main():
                 unfulfilled_count=ai_result.get('unfulfilled_count', 0)
             )
 
+    print_filter_stats(processor.filter_engine.get_stats())
+
+async def backfill(days_back=365, chats_limit=50):
+    """Завантаження історії чатів у базу даних з можливістю продовження після збою"""
+    telegram = TelegramAnalyzer(TELEGRAM_API_ID, TELEGRAM_API_HASH, TELEGRAM_PHONE)
+    db = Database()
+
+    await telegram.connect()
+    recent_chats = await telegram.get_recent_chats(limit=chats_limit)
+
+    # Пауза між запитами, підлаштована під FloodWait, зберігається в telegram
+    # (backfill_wait_time) і переходить до наступного чату
+    for chat in recent_chats:
+        print(f"\n--- Завантаження історії чату: {chat['name']} (ID: {chat['id']}) ---")
+        await telegram.backfill_chat_history(chat['id'], db, days_back=days_back)
+
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        days_back = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+        asyncio.run(backfill(days_back=days_back))
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -9,8 +9,10 @@ class AiAnalizer:
             api_key=api_key,
         )
 
-    def analyze_conversation(self, messages):
-        conversation_text = self._prepare_conversation_text(messages)
+    def analyze_conversation(self, messages=None, conversation_text=None):
+        """Аналіз розмови: за списком повідомлень або готовим текстом (prepare_for_ai_analysis)"""
+        if conversation_text is None:
+            conversation_text = self._prepare_conversation_text(messages)
 
         prompt = f"""
         Проаналізуй наступну розмову між менеджером та клієнтом.
@@ -18,6 +20,8 @@ class AiAnalizer:
         Розмова:
         {conversation_text}
 
+        Повідомлення "[повтор шаблону #N]" повторює повідомлення, позначене "[шаблон #N]", і надіслане в зазначений час; "відмінності" - слова, яких немає в шаблоні.
+
         Завдання:
         1. Знайди всі обіцянки менеджера щодо термінів виконання (до кінця дня, завтра, через годину тощо)
         2. Перевір, чи були ці обіцянки виконані в зазначені терміни
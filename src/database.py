@@ -1,7 +1,22 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timezone
+
+# Токенізатор FTS5 для українського тексту:
+# - усі варіанти апострофа (', ’, ʼ) є роздільниками, тому "п'ятниці"
+#   знаходить і "П’ятниці", і "Пʼятниці" (ʼ належить до літер, тож його
+#   вказано явно, решта є роздільниками в unicode61 за замовчуванням);
+# - регістр не враховується, а "ї", "й", "є" лишаються окремими літерами;
+# - префіксні індекси прискорюють пошук за основою слова ("догов*").
+FTS_TOKENIZER = "unicode61 remove_diacritics 2 separators 'ʼ'"
+FTS_PREFIX = "2 3 4"
+
+# Скільки рядків, відібраних фільтрами за чатом і датою, переглядається через
+# індекс, щоб обмежити пошук FTS5 діапазоном їх rowid
+FTS_RANGE_SCAN_LIMIT = 50000
+
+PROMISE_STATUSES = ('potential', 'fulfilled', 'unfulfilled')
 
 class Database:
     def __init__(self, db_path="data\\chats.db"):
@@ -14,6 +29,8 @@ class Database:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS chat_analysis (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -25,9 +42,114 @@ class Database:
             )
         """)
         
+        # Повідомлення чатів
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                date TIMESTAMP,
+                from_me INTEGER,
+                text TEXT,
+                UNIQUE (chat_id, message_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_messages_chat_date
+            ON messages (chat_id, date)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_messages_date
+            ON messages (date)
+        """)
+        
+        # Обіцянки, витягнуті з повідомлень
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS promises (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER,
+                date TIMESTAMP,
+                from_me INTEGER,
+                promise_text TEXT,
+                deadline TEXT,
+                status TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_promises_chat_date
+            ON promises (chat_id, date)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_promises_date
+            ON promises (date)
+        """)
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_promises_unique
+            ON promises (chat_id, COALESCE(message_id, -1), promise_text)
+        """)
+        
+        # Стан завантаження історії (backfill) для кожного чату
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+                chat_id INTEGER PRIMARY KEY,
+                start_date TIMESTAMP,
+                last_message_id INTEGER,
+                last_date TIMESTAMP,
+                messages_count INTEGER,
+                completed INTEGER,
+                gap_end_date TIMESTAMP,
+                gap_end_id INTEGER,
+                updated_at TIMESTAMP
+            )
+        """)
+        
+        self._init_search_index(cursor)
+        
         conn.commit()
         conn.close()
     
+    def _init_search_index(self, cursor):
+        """
+        Створення повнотекстових індексів FTS5 над повідомленнями та обіцянками.
+        
+        Індекси працюють у режимі external content, тому текст не дублюється,
+        а тригери тримають їх синхронними при вставці, оновленні та видаленні.
+        """
+        for table, column in (('messages', 'text'), ('promises', 'promise_text')):
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5 (
+                    {column},
+                    content='{table}',
+                    content_rowid='id',
+                    tokenize="{FTS_TOKENIZER}",
+                    prefix='{FTS_PREFIX}'
+                )
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_insert
+                AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {table}_fts (rowid, {column})
+                    VALUES (new.id, new.{column});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_delete
+                AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, {column})
+                    VALUES ('delete', old.id, old.{column});
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_update
+                AFTER UPDATE OF {column} ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, {column})
+                    VALUES ('delete', old.id, old.{column});
+                    INSERT INTO {table}_fts (rowid, {column})
+                    VALUES (new.id, new.{column});
+                END
+            """)
+    
     def save_analysis(self, chat_id, chat_name,):
         """Збереження результатів аналізу"""
         conn = sqlite3.connect(self.db_path)
@@ -44,4 +166,301 @@ class Database:
         ))
         
         conn.commit()
-        conn.close()
\ No newline at end of file
+        conn.close()
+    
+    def save_messages(self, messages):
+        """
+        Збереження повідомлень чату.
+        
+        Повідомлення, які вже є в базі (той самий chat_id та id), оновлюються,
+        тому повторне завантаження історії не створює дублікатів.
+        """
+        if not messages:
+            return
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        self._insert_messages(cursor, messages)
+        
+        conn.commit()
+        conn.close()
+    
+    def _insert_messages(self, cursor, messages):
+        """Вставка або оновлення повідомлень у межах поточної транзакції"""
+        rows = [
+            (
+                msg['chat_id'],
+                msg['id'],
+                _format_date(msg.get('date')),
+                int(bool(msg.get('from_me'))),
+                msg.get('text') or ''
+            )
+            for msg in messages
+        ]
+        cursor.executemany("""
+            INSERT INTO messages (chat_id, message_id, date, from_me, text)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (chat_id, message_id) DO UPDATE SET
+                date = excluded.date,
+                from_me = excluded.from_me,
+                text = excluded.text
+        """, rows)
+    
+    def get_backfill_checkpoint(self, chat_id):
+        """Отримання стану завантаження історії чату (None, якщо ще не починали)"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT chat_id, start_date, last_message_id, last_date,
+                   messages_count, completed, gap_end_date, gap_end_id, updated_at
+            FROM backfill_checkpoints
+            WHERE chat_id = ?
+        """, (chat_id,))
+        row = cursor.fetchone()
+        
+        conn.close()
+        if row is None:
+            return None
+        checkpoint = dict(row)
+        checkpoint['completed'] = bool(checkpoint['completed'])
+        return checkpoint
+    
+    def save_backfill_batch(self, chat_id, messages, checkpoint):
+        """
+        Збереження пачки повідомлень разом з контрольною точкою.
+        
+        Повідомлення та checkpoint записуються в одній транзакції, тому після
+        збою завантаження продовжується рівно з останньої збереженої пачки.
+        
+        Args:
+            chat_id: ID чату
+            messages: Список повідомлень у форматі save_messages
+            checkpoint: Словник з ключами start_date, last_message_id,
+                last_date, messages_count, completed, а також gap_end_date
+                і gap_end_id (межа вже завантаженого відрізка при розширенні
+                періоду)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        if messages:
+            self._insert_messages(cursor, messages)
+        cursor.execute("""
+            INSERT INTO backfill_checkpoints
+            (chat_id, start_date, last_message_id, last_date,
+             messages_count, completed, gap_end_date, gap_end_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (chat_id) DO UPDATE SET
+                start_date = excluded.start_date,
+                last_message_id = excluded.last_message_id,
+                last_date = excluded.last_date,
+                messages_count = excluded.messages_count,
+                completed = excluded.completed,
+                gap_end_date = excluded.gap_end_date,
+                gap_end_id = excluded.gap_end_id,
+                updated_at = excluded.updated_at
+        """, (
+            chat_id,
+            _format_date(checkpoint.get('start_date')),
+            checkpoint.get('last_message_id') or 0,
+            _format_date(checkpoint.get('last_date')),
+            checkpoint.get('messages_count', 0),
+            int(bool(checkpoint.get('completed'))),
+            _format_date(checkpoint.get('gap_end_date')),
+            checkpoint.get('gap_end_id'),
+            _format_date(datetime.now(timezone.utc))
+        ))
+        
+        conn.commit()
+        conn.close()
+    
+    def save_promises(self, chat_id, promises):
+        """
+        Збереження обіцянок чату.
+        
+        Повторно збережена обіцянка (той самий чат, повідомлення та текст)
+        не дублюється, а оновлює свій термін і статус.
+        
+        Args:
+            chat_id: ID чату
+            promises: Список словників з ключами promise_text, message_id,
+                date, from_me, deadline та status (одне з PROMISE_STATUSES)
+        """
+        rows = []
+        for promise in promises:
+            status = promise.get('status', 'potential')
+            if status not in PROMISE_STATUSES:
+                raise ValueError(f"Невідомий статус обіцянки: {status}")
+            rows.append((
+                chat_id,
+                promise.get('message_id'),
+                _format_date(promise.get('date')),
+                int(bool(promise.get('from_me', True))),
+                promise.get('promise_text') or '',
+                promise.get('deadline'),
+                status
+            ))
+        if not rows:
+            return
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany("""
+            INSERT INTO promises
+            (chat_id, message_id, date, from_me, promise_text, deadline, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (chat_id, COALESCE(message_id, -1), promise_text) DO UPDATE SET
+                deadline = excluded.deadline,
+                status = excluded.status
+        """, rows)
+        
+        conn.commit()
+        conn.close()
+    
+    def search_messages(self, query, chat_id=None, from_me=None,
+                        date_from=None, date_to=None, limit=50):
+        """
+        Повнотекстовий пошук по повідомленнях.
+        
+        Кожне слово запиту шукається як префікс, тому для пошуку по всіх
+        відмінках варто передавати основу слова ("догов", "кошторис").
+        
+        Returns:
+            Список словників з полями повідомлення та фрагментом snippet,
+            у якому знайдені слова виділені квадратними дужками. Порядок -
+            за часом запису в базу (останні записані першими), а не за датою
+            повідомлення: так LIMIT зупиняє пошук без сортування всіх збігів
+        """
+        return self._search(
+            'messages', query, chat_id, from_me, date_from, date_to, limit,
+            columns="m.message_id, m.text"
+        )
+    
+    def search_promises(self, query, chat_id=None, from_me=None,
+                        date_from=None, date_to=None, status=None, limit=50):
+        """Повнотекстовий пошук по обіцянках з фільтром за статусом"""
+        extra_filters = []
+        if status is not None:
+            if status not in PROMISE_STATUSES:
+                raise ValueError(f"Невідомий статус обіцянки: {status}")
+            extra_filters.append(("m.status = ?", status))
+        
+        return self._search(
+            'promises', query, chat_id, from_me, date_from, date_to, limit,
+            columns="m.message_id, m.promise_text, m.deadline, m.status",
+            extra_filters=extra_filters
+        )
+    
+    def _search(self, table, query, chat_id, from_me, date_from, date_to,
+                limit, columns, extra_filters=()):
+        """
+        Спільна частина пошуку по FTS5 індексу з фільтрами.
+        
+        Без фільтрів FTS5 віддає збіги від найбільшого rowid і LIMIT зупиняє
+        пошук одразу. Вибіркові фільтри за чатом і датою так не працюють:
+        до потрібних рядків довелося б перебрати всі новіші збіги. Тому
+        спершу через індекс (chat_id, date) чи (date) визначається діапазон
+        rowid відібраних рядків, і MATCH обмежується ним.
+        """
+        match = _build_fts_query(query)
+        if not match:
+            return []
+        
+        index_conditions, index_params = [], []
+        if chat_id is not None:
+            index_conditions.append("chat_id = ?")
+            index_params.append(chat_id)
+        if date_from is not None:
+            index_conditions.append("date >= ?")
+            index_params.append(_format_date(date_from))
+        if date_to is not None:
+            index_conditions.append("date <= ?")
+            index_params.append(_format_date(date_to))
+        
+        conditions = [f"{table}_fts MATCH ?"] + [f"m.{c}" for c in index_conditions]
+        params = [match] + index_params
+        if from_me is not None:
+            conditions.append("m.from_me = ?")
+            params.append(int(bool(from_me)))
+        for condition, value in extra_filters:
+            conditions.append(condition)
+            params.append(value)
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        if index_conditions:
+            cursor.execute(f"""
+                SELECT min(id), max(id), count(*) FROM (
+                    SELECT id FROM {table}
+                    WHERE {' AND '.join(index_conditions)}
+                    LIMIT ?
+                )
+            """, index_params + [FTS_RANGE_SCAN_LIMIT])
+            low, high, count = cursor.fetchone()
+            if count == 0:
+                conn.close()
+                return []
+            # Якщо під фільтри потрапляє забагато рядків, вони не вибіркові
+            # і звичайний пошук від новіших збігів зупиниться швидко
+            if count < FTS_RANGE_SCAN_LIMIT:
+                conditions.append(f"{table}_fts.rowid BETWEEN ? AND ?")
+                params.extend([low, high])
+        params.append(limit)
+        
+        cursor.execute(f"""
+            SELECT m.chat_id, m.date, m.from_me, {columns},
+                   snippet({table}_fts, 0, '[', ']', '…', 12) AS snippet
+            FROM {table}_fts
+            JOIN {table} AS m ON m.id = {table}_fts.rowid
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {table}_fts.rowid DESC
+            LIMIT ?
+        """, params)
+        
+        results = []
+        for row in cursor.fetchall():
+            result = dict(row)
+            result['from_me'] = bool(result['from_me'])
+            results.append(result)
+        
+        conn.close()
+        return results
+
+
+def _format_date(value):
+    """
+    Приведення дати до рядка в UTC, придатного для порівняння в SQL.
+
+    Рядки розбираються як ISO дата; рядок в іншому форматі дає None,
+    щоб довільний текст не потрапив у колонку дати.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _build_fts_query(query):
+    """
+    Перетворення пошукового рядка у запит FTS5.
+    
+    Слова береться в лапки, щоб символи на кшталт '-' чи ':' не ламали
+    синтаксис FTS5, і шукаються як префікси; в тексті мають бути всі слова.
+    """
+    terms = []
+    for word in query.split():
+        word = word.replace('"', '""')
+        terms.append(f'"{word}"*')
+    return ' '.join(terms)
@@ -0,0 +1,138 @@
+# src/deduplicator.py
+
+"""
+Модуль для виявлення точних та майже однакових (шаблонних) повідомлень.
+Використовує MinHash по словесних шинглах та LSH для швидкого пошуку
+схожих текстів серед усіх вже оброблених повідомлень.
+"""
+
+import random
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class MessageDeduplicator:
+    """
+    Кластеризація повідомлень за схожістю тексту.
+
+    Кожному тексту присвоюється ID кластера: точні повтори (без урахування
+    регістру) потрапляють у кластер через словник, майже однакові (зокрема
+    з іншими пробілами) - через LSH по MinHash сигнатурах з перевіркою оцінки
+    подібності Жаккара. Індекс зберігається між викликами, тому повтори
+    знаходяться як у межах одного чату, так і між різними чатами. Щоб
+    індекс не ріс без обмежень у довгих запусках, після max_texts різних
+    текстів він очищується (ID нових кластерів при цьому не повторюються).
+
+    MinHash рахується як мінімум hash(шингл) XOR випадкова маска для кожної
+    "перестановки": hash() рядка вже дає рівномірні 64-бітні значення, а
+    XOR через map() виконується без Python-арифметики на кожен шингл.
+    """
+
+    _MASK_BITS = 64
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 16,
+                 bands: int = 4, shingle_size: int = 3, seed: int = 1,
+                 max_texts: int = 50000):
+        if num_perm % bands:
+            raise ValueError("num_perm має ділитися на bands без остачі")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_texts = max_texts
+
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(self._MASK_BITS) for _ in range(num_perm)]
+
+        self._exact: Dict[Tuple[str, Optional[Hashable]], int] = {}
+        self._buckets: List[Dict[Tuple, List[int]]] = [defaultdict(list) for _ in range(bands)]
+        self._signatures: Dict[int, List[int]] = {}
+        self._keys: Dict[int, Optional[Hashable]] = {}
+        self._next_id = 0
+
+    def assign(self, text: str, key: Optional[Hashable] = None,
+               near_duplicates: bool = True) -> int:
+        """
+        Визначення кластера для тексту.
+
+        Args:
+            text: Текст повідомлення
+            key: Додаткова умова - тексти (і точні, і майже однакові)
+                об'єднуються лише за однакового key
+            near_duplicates: Шукати майже однакові тексти; якщо False,
+                текст об'єднується лише з точними повторами
+
+        Returns:
+            ID кластера (новий, якщо схожих текстів ще не було)
+        """
+        # Лише lower(): на кожному повідомленні split/join помітно дорожчі,
+        # а відмінності в пробілах знаходить MinHash
+        text_lower = text.lower()
+        exact_key = (text_lower, key)
+
+        cluster_id = self._exact.get(exact_key)
+        if cluster_id is None:
+            if len(self._exact) >= self.max_texts:
+                self.clear()
+            if near_duplicates:
+                signature = self._minhash(text_lower)
+                cluster_id = self._find_similar(signature, key)
+                if cluster_id is None:
+                    cluster_id = self._new_cluster()
+                    self._signatures[cluster_id] = signature
+                    self._keys[cluster_id] = key
+                    for band, bucket_key in enumerate(self._band_keys(signature)):
+                        self._buckets[band][bucket_key].append(cluster_id)
+            else:
+                cluster_id = self._new_cluster()
+            self._exact[exact_key] = cluster_id
+
+        return cluster_id
+
+    def clear(self):
+        """Очищення індексу; нумерація кластерів продовжується"""
+        self._exact.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+        self._signatures.clear()
+        self._keys.clear()
+
+    def _new_cluster(self) -> int:
+        cluster_id = self._next_id
+        self._next_id += 1
+        return cluster_id
+
+    def _find_similar(self, signature: List[int], key: Optional[Hashable]) -> Optional[int]:
+        """Пошук кластера з подібністю не нижче порогу серед кандидатів LSH"""
+        candidates = set()
+        for band, bucket_key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(bucket_key, ()))
+
+        best_id, best_similarity = None, self.threshold
+        for cluster_id in candidates:
+            if self._keys[cluster_id] != key:
+                continue
+            other = self._signatures[cluster_id]
+            matches = sum(1 for a, b in zip(signature, other) if a == b)
+            similarity = matches / self.num_perm
+            if similarity >= best_similarity:
+                best_id, best_similarity = cluster_id, similarity
+        return best_id
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(self.bands):
+            yield tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def _minhash(self, text: str) -> List[int]:
+        """MinHash сигнатура множини словесних шинглів"""
+        words = text.split()
+        if len(words) <= self.shingle_size:
+            shingles = {' '.join(words)}
+        else:
+            size = self.shingle_size
+            shingles = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+        hashes = [hash(shingle) & 0xFFFFFFFFFFFFFFFF for shingle in shingles]
+        return [min(map(mask.__xor__, hashes)) for mask in self._masks]
@@ -0,0 +1,322 @@
+# src/exporter.py
+
+"""
+Модуль для колонкового експорту результатів обробки у Parquet.
+Записує повідомлення, скори обіцянок, контекстні групи та обіцянки
+у набори даних, розбиті на партиції за чатом і місяцем.
+"""
+
+import hashlib
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow потрібен лише для експорту
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    """
+    Схеми наборів даних.
+    
+    Колонка chat_id не зберігається у файлах: вона, як і month,
+    закодована в шляху партиції (chat_id=.../month=...).
+    """
+    timestamp = pa.timestamp('us', tz='UTC')
+    return {
+        'messages': pa.schema([
+            ('message_id', pa.int64()),
+            ('date', timestamp),
+            ('from_me', pa.bool_()),
+            ('text', pa.string()),
+        ]),
+        'scores': pa.schema([
+            ('message_id', pa.int64()),
+            ('date', timestamp),
+            ('promise_score', pa.int32()),
+            ('time_score', pa.int32()),
+            ('business_score', pa.int32()),
+            ('total_score', pa.int32()),
+            ('extracted_promises', pa.list_(pa.string())),
+            ('extracted_times', pa.list_(pa.string())),
+        ]),
+        'context_groups': pa.schema([
+            ('start_time', timestamp),
+            ('end_time', timestamp),
+            ('duration_minutes', pa.float64()),
+            ('manager_messages', pa.int32()),
+            ('client_messages', pa.int32()),
+            ('total_messages', pa.int32()),
+            ('message_ids', pa.list_(pa.int64())),
+            ('exported_at', timestamp),
+        ]),
+        'promises': pa.schema([
+            ('message_id', pa.int64()),
+            ('date', timestamp),
+            ('from_me', pa.bool_()),
+            ('promise_text', pa.string()),
+            ('deadline', pa.string()),
+            ('status', pa.string()),
+        ]),
+    }
+
+
+class _PartitionedWriter:
+    """
+    Потоковий запис одного набору даних у партиції chat_id=<id>/month=<YYYY-MM>
+    (month=unknown для рядків без дати).
+    
+    Рядки накопичуються в буфері лише до batch_size на партицію, після чого
+    скидаються у відкритий ParquetWriter, тому пам'ять обмежена незалежно
+    від обсягу експорту. Кожен запуск створює нові файли part-<run_id>,
+    не змінюючи вже записані.
+    """
+    
+    def __init__(self, root: str, schema: "pa.Schema", run_id: str, batch_size: int):
+        self.root = root
+        self.schema = schema
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self._buffers = defaultdict(list)
+        self._writers = {}
+        self.rows_written = 0
+    
+    def write(self, chat_id: int, date: Optional[datetime], row: Dict):
+        partition = (chat_id, date.strftime('%Y-%m') if date else 'unknown')
+        buffer = self._buffers[partition]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self._flush(partition)
+    
+    def close(self):
+        for partition in list(self._buffers):
+            self._flush(partition)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+    
+    def _flush(self, partition):
+        rows = self._buffers.pop(partition, None)
+        if not rows:
+            return
+        
+        writer = self._writers.get(partition)
+        if writer is None:
+            chat_id, month = partition
+            directory = os.path.join(self.root, f"chat_id={chat_id}", f"month={month}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{self.run_id}.parquet")
+            writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+            self._writers[partition] = writer
+        
+        writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        self.rows_written += len(rows)
+
+
+class ParquetExporter:
+    """
+    Інкрементальний експорт результатів обробки у партиціоновані Parquet файли.
+    
+    Для кожного чату зберігається дата та ID останнього експортованого
+    повідомлення і хеші вже записаних обіцянок від AI (файл _state.json у
+    каталозі експорту), тож повторний запуск дописує лише нові дані.
+    Контекстна група, що отримала нові повідомлення, записується повторно
+    як нова версія (колонка exported_at). Отримані каталоги читаються
+    напряму, наприклад pyarrow.dataset.dataset(path, partitioning='hive')
+    чи DuckDB.
+    """
+    
+    STATE_FILE = '_state.json'
+    
+    def __init__(self, export_dir: str = os.path.join('data', 'export'),
+                 batch_size: int = 10000):
+        if pa is None:
+            raise ImportError("Для експорту в Parquet потрібен пакет pyarrow")
+        
+        self.export_dir = export_dir
+        self.batch_size = batch_size
+        self.schemas = _schemas()
+        os.makedirs(self.export_dir, exist_ok=True)
+        self._state = self._load_state()
+    
+    def export_conversation(self, conversation, potential_promises: List[Dict],
+                            message_groups: List[Dict],
+                            promises: Iterable[Dict] = ()) -> Dict[str, int]:
+        """
+        Експорт однієї обробленої розмови.
+        
+        Args:
+            conversation: Об'єкт Conversation з MessageProcessor
+            potential_promises: Результат find_potential_promises
+            message_groups: Результат group_messages_by_context
+            promises: Обіцянки у форматі Database.save_promises
+        
+        Returns:
+            Кількість записаних рядків для кожного набору даних
+        """
+        chat_id = conversation.chat_id
+        watermark = self._get_watermark(chat_id)
+        exported_promises = set(self._state.get(str(chat_id), {}).get('promise_hashes', []))
+        new_promise_hashes = []
+        run_id = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        exported_at = datetime.now(timezone.utc)
+        writers = {
+            name: _PartitionedWriter(
+                os.path.join(self.export_dir, name), schema, run_id, self.batch_size
+            )
+            for name, schema in self.schemas.items()
+        }
+        
+        def is_new(msg) -> bool:
+            # Дати Telegram мають точність до секунди, тому порівнюється
+            # пара (дата, ID), а не лише дата
+            return watermark is None or _message_key(msg) > watermark
+        
+        try:
+            latest = watermark
+            for msg in conversation.messages:
+                if not is_new(msg):
+                    continue
+                date = _to_utc(msg.date)
+                writers['messages'].write(chat_id, date, {
+                    'message_id': msg.id,
+                    'date': date,
+                    'from_me': msg.from_me,
+                    'text': msg.text,
+                })
+                if latest is None or _message_key(msg) > latest:
+                    latest = _message_key(msg)
+            
+            for candidate in potential_promises:
+                msg = candidate['message']
+                if not is_new(msg):
+                    continue
+                date = _to_utc(msg.date)
+                writers['scores'].write(chat_id, date, {
+                    'message_id': msg.id,
+                    'date': date,
+                    'promise_score': candidate['promise_score'],
+                    'time_score': candidate['time_score'],
+                    'business_score': candidate['business_score'],
+                    'total_score': candidate['total_score'],
+                    'extracted_promises': candidate['extracted_promises'],
+                    'extracted_times': [t['keyword'] for t in candidate['extracted_times']],
+                })
+            
+            # Група з новими повідомленнями записується повністю, навіть якщо
+            # її початок вже був експортований: актуальна версія групи -
+            # рядок з найпізнішим exported_at для того ж start_time
+            for group in message_groups:
+                if not any(is_new(m) for m in group['messages']):
+                    continue
+                start_time = _to_utc(group['start_time'])
+                writers['context_groups'].write(chat_id, start_time, {
+                    'start_time': start_time,
+                    'end_time': _to_utc(group['end_time']),
+                    'duration_minutes': group['duration_minutes'],
+                    'manager_messages': group['manager_messages'],
+                    'client_messages': group['client_messages'],
+                    'total_messages': group['total_messages'],
+                    'message_ids': [m.id for m in group['messages']],
+                    'exported_at': exported_at,
+                })
+            
+            # Обіцянки повідомлень відбираються за watermark, а обіцянки без
+            # повідомлення (від AI) - за хешем тексту, щоб не дублювати їх при
+            # кожному запуску. Обіцянка без дати, як і в базі даних, має
+            # порожню дату і потрапляє в партицію month=unknown
+            for promise in promises:
+                date = _parse_date(promise.get('date'))
+                message_id = promise.get('message_id')
+                if message_id is not None and date is not None:
+                    if watermark is not None and (date, message_id) <= watermark:
+                        continue
+                else:
+                    promise_hash = _promise_hash(chat_id, promise.get('promise_text') or '')
+                    if promise_hash in exported_promises:
+                        continue
+                    exported_promises.add(promise_hash)
+                    new_promise_hashes.append(promise_hash)
+                writers['promises'].write(chat_id, date, {
+                    'message_id': message_id,
+                    'date': date,
+                    'from_me': bool(promise.get('from_me', True)),
+                    'promise_text': promise.get('promise_text') or '',
+                    'deadline': promise.get('deadline'),
+                    'status': promise.get('status', 'potential'),
+                })
+        finally:
+            for writer in writers.values():
+                writer.close()
+        
+        if (latest is not None and latest != watermark) or new_promise_hashes:
+            self._update_state(chat_id, latest, new_promise_hashes)
+        
+        stats = {name: writer.rows_written for name, writer in writers.items()}
+        logger.info(f"Експорт чату {chat_id} у Parquet: {stats}")
+        return stats
+    
+    def _load_state(self) -> Dict[str, Dict]:
+        path = os.path.join(self.export_dir, self.STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _get_watermark(self, chat_id: int) -> Optional[Tuple[datetime, int]]:
+        value = self._state.get(str(chat_id))
+        if not value or not value.get('date'):
+            return None
+        return datetime.fromisoformat(value['date']), value['message_id']
+    
+    def _update_state(self, chat_id: int, key: Optional[Tuple[datetime, int]],
+                      promise_hashes: List[str]):
+        value = self._state.setdefault(str(chat_id), {})
+        if key is not None:
+            date, message_id = key
+            value['date'] = date.isoformat()
+            value['message_id'] = message_id
+        if promise_hashes:
+            value['promise_hashes'] = value.get('promise_hashes', []) + promise_hashes
+        path = os.path.join(self.export_dir, self.STATE_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+def _promise_hash(chat_id: int, promise_text: str) -> str:
+    """Хеш обіцянки без повідомлення для пропуску вже експортованих"""
+    return hashlib.sha1(f"{chat_id}\n{promise_text}".encode('utf-8')).hexdigest()
+
+
+def _message_key(msg) -> Tuple[datetime, int]:
+    """Ключ порядку повідомлень для watermark: (дата в UTC, ID)"""
+    return _to_utc(msg.date), msg.id
+
+def _to_utc(value: datetime) -> datetime:
+    """Приведення дати до UTC (дати без часового поясу вважаються UTC)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _parse_date(value) -> Optional[datetime]:
+    """Розбір дати обіцянки, яка може бути рядком від AI"""
+    if isinstance(value, datetime):
+        return _to_utc(value)
+    if isinstance(value, str):
+        try:
+            return _to_utc(datetime.fromisoformat(value))
+        except ValueError:
+            return None
+    return None
@@ -0,0 +1,250 @@
+# src/filter_rules.py
+
+"""
+Модуль з правилами фільтрації повідомлень.
+Правила описуються даними (список словників або JSON файл) і один раз
+компілюються у спільний матчер, тож нові правила додаються без зміни коду.
+"""
+
+import json
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Символи emoji та пробіли: повідомлення лише з них відкидається
+EMOJI_CHARS = (
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags
+    "\U00002500-\U00002BEF"
+    "\U00002702-\U000027B0"
+    "\U000024C2-\U0001F251"
+    "\u2640-\u2642"
+    "\u2600-\u2B55"
+    "\u200d"
+    "\u23cf"
+    "\u23e9"
+    "\u231a"
+    "\ufe0f"
+    "\u3030"
+    "\\s"  # пробіли
+)
+
+# Правила за замовчуванням. Типи правил:
+# - min_length: відкинути, якщо текст без пробілів по краях коротший за value
+# - max_length: відкинути, якщо текст довший за value
+# - only_chars: відкинути, якщо текст складається лише з символів chars
+#   (тіло класу символів регулярного виразу)
+# - pattern: відкинути, якщо в тексті знайдено регулярний вираз pattern
+#   (ignore_case, за замовчуванням True)
+# - max_substring_count: відкинути, якщо substring трапляється більше value разів
+# - max_uppercase_ratio: відкинути, якщо частка латинських великих літер більша за value
+DEFAULT_FILTER_RULES = [
+    {'name': 'too_short', 'type': 'min_length', 'value': 3},
+    {'name': 'only_emoji', 'type': 'only_chars', 'chars': EMOJI_CHARS},
+    {'name': 'system_joined', 'type': 'pattern', 'pattern': 'приєднався до групи'},
+    {'name': 'system_left', 'type': 'pattern', 'pattern': 'залишив групу'},
+    {'name': 'system_renamed', 'type': 'pattern', 'pattern': 'змінив назву групи'},
+    {'name': 'system_photo_set', 'type': 'pattern', 'pattern': 'встановив фото групи'},
+    {'name': 'system_photo_removed', 'type': 'pattern', 'pattern': 'видалив фото групи'},
+    {'name': 'spam_too_long', 'type': 'max_length', 'value': 1000},
+    {'name': 'spam_links', 'type': 'max_substring_count', 'substring': 'http', 'value': 3},
+    {'name': 'spam_uppercase', 'type': 'max_uppercase_ratio', 'value': 0.7},
+]
+
+# Обов'язкові параметри кожного типу правил. Порядок типів - це порядок,
+# у якому FilterRuleEngine.match перевіряє правила (від найдешевших)
+RULE_TYPES = {
+    'min_length': ('value',),
+    'max_length': ('value',),
+    'only_chars': ('chars',),
+    'pattern': ('pattern',),
+    'max_substring_count': ('substring', 'value'),
+    'max_uppercase_ratio': ('value',),
+}
+
+# Прапорці, які re.compile ставить за замовчуванням для str-шаблонів
+_DEFAULT_FLAGS = re.compile('').flags
+
+# Таблиця для str.translate, що видаляє латинські великі літери
+_UPPERCASE_DELETE = str.maketrans('', '', 'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+
+def load_filter_rules(path: str) -> List[Dict]:
+    """Завантаження правил фільтрації з JSON файлу (список об'єктів правил)"""
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"Файл правил {path} має містити список правил")
+    return rules
+
+
+class FilterRuleEngine:
+    """
+    Скомпільований набір правил фільтрації.
+    
+    Кожне правило перевіряється та компілюється окремо, а помилки в ньому
+    (відсутній параметр, некоректний регулярний вираз) повідомляються з
+    назвою правила. Правила only_chars та pattern об'єднуються в один
+    регулярний вираз з іменованими групами, тому кожне повідомлення
+    перевіряється одним проходом regex. Вирази з власними групами
+    (зворотні посилання, іменовані групи) або глобальними прапорцями на
+    кшталт (?i) не можна безпечно вбудувати в спільний вираз, тому вони
+    перевіряються окремо. Решта правил - прості операції над рядком.
+    
+    Правила перевіряються в порядку типів з RULE_TYPES, а не в порядку
+    конфігурації: довжина, символи та регулярні вирази, кількість
+    підрядків, частка великих літер. Для кожного правила рахується
+    кількість відкинутих повідомлень, і кожне повідомлення зараховується
+    лише одному правилу: першому за цим порядком типів. Серед правил
+    спільного регулярного виразу це правило, збіг якого знайдено в тексті
+    найраніше (за однакової позиції - раніше в конфігурації), далі -
+    окремо перевірювані вирази в порядку конфігурації.
+    """
+    
+    def __init__(self, rules: Optional[List[Dict]] = None):
+        self.rules = list(DEFAULT_FILTER_RULES if rules is None else rules)
+        self.stats: Counter = Counter()
+        self.checked = 0
+        
+        self._min_length: Optional[Tuple[str, int]] = None
+        self._max_length: Optional[Tuple[str, int]] = None
+        self._substring_counts: List[Tuple[str, str, int]] = []
+        self._uppercase_ratios: List[Tuple[str, float]] = []
+        self._matcher: Optional[re.Pattern] = None
+        self._group_names: Dict[str, str] = {}
+        self._separate_patterns: List[Tuple[str, re.Pattern]] = []
+        
+        self._compile()
+    
+    def _compile(self):
+        """Перевірка правил та їх компіляція"""
+        alternatives = []
+        names = set()
+        
+        for rule in self.rules:
+            if not isinstance(rule, dict):
+                raise ValueError(f"Правило має бути словником: {rule!r}")
+            name, rule_type = rule.get('name'), rule.get('type')
+            if not name:
+                raise ValueError(f"Правило без назви: {rule}")
+            if name in names:
+                raise ValueError(f"Повторна назва правила: {name}")
+            if rule_type not in RULE_TYPES:
+                raise ValueError(f"Невідомий тип правила {name}: {rule_type}")
+            missing = [param for param in RULE_TYPES[rule_type] if param not in rule]
+            if missing:
+                raise ValueError(f"Правило {name} ({rule_type}) без параметрів: {', '.join(missing)}")
+            if 'value' in rule and (isinstance(rule['value'], bool)
+                                    or not isinstance(rule['value'], (int, float))):
+                raise ValueError(f"Параметр value правила {name} має бути числом: {rule['value']!r}")
+            names.add(name)
+            
+            if rule_type == 'min_length':
+                # Лишається найсуворіше обмеження
+                if self._min_length is None or rule['value'] > self._min_length[1]:
+                    self._min_length = (name, rule['value'])
+            elif rule_type == 'max_length':
+                if self._max_length is None or rule['value'] < self._max_length[1]:
+                    self._max_length = (name, rule['value'])
+            elif rule_type == 'max_substring_count':
+                self._substring_counts.append((name, rule['substring'], rule['value']))
+            elif rule_type == 'max_uppercase_ratio':
+                self._uppercase_ratios.append((name, rule['value']))
+            else:
+                if rule_type == 'only_chars':
+                    body = f"\\A[{rule['chars']}]+\\Z"
+                    flags = 0
+                else:
+                    body = rule['pattern']
+                    flags = re.IGNORECASE if rule.get('ignore_case', True) else 0
+                
+                try:
+                    compiled = re.compile(body, flags)
+                except (re.error, TypeError) as e:
+                    raise ValueError(f"Некоректний регулярний вираз правила {name}: {e}") from e
+                
+                # Глобальні прапорці в самому виразі змінюють flags і без параметра flags
+                has_inline_flags = re.compile(body).flags != _DEFAULT_FLAGS
+                if compiled.groups or has_inline_flags:
+                    self._separate_patterns.append((name, compiled))
+                    continue
+                
+                group = f"r{len(self._group_names)}"
+                self._group_names[group] = name
+                if flags:
+                    body = f"(?i:{body})"
+                alternatives.append(f"(?P<{group}>{body})")
+        
+        if alternatives:
+            self._matcher = re.compile('|'.join(alternatives))
+    
+    def match(self, text: str) -> Optional[str]:
+        """
+        Перевірка одного тексту (порядок перевірки - див. опис класу).
+        
+        Returns:
+            Назва першого правила, що спрацювало, або None
+        """
+        if not text:
+            return self._min_length[0] if self._min_length else None
+        
+        if self._min_length and len(text.strip()) < self._min_length[1]:
+            return self._min_length[0]
+        if self._max_length and len(text) > self._max_length[1]:
+            return self._max_length[0]
+        
+        if self._matcher:
+            found = self._matcher.search(text)
+            if found:
+                return self._group_names[found.lastgroup]
+        for name, pattern in self._separate_patterns:
+            if pattern.search(text):
+                return name
+        
+        for name, substring, limit in self._substring_counts:
+            if text.count(substring) > limit:
+                return name
+        if self._uppercase_ratios:
+            ratio = (len(text) - len(text.translate(_UPPERCASE_DELETE))) / len(text)
+            for name, limit in self._uppercase_ratios:
+                if ratio > limit:
+                    return name
+        
+        return None
+    
+    def filter(self, messages: List) -> List:
+        """
+        Фільтрація пачки повідомлень (об'єктів з атрибутом text).
+        
+        Returns:
+            Повідомлення, що пройшли всі правила
+        """
+        match = self.match
+        kept = []
+        dropped = Counter()
+        
+        for msg in messages:
+            rule_name = match(msg.text)
+            if rule_name is None:
+                kept.append(msg)
+            else:
+                dropped[rule_name] += 1
+        
+        self.stats.update(dropped)
+        self.checked += len(messages)
+        if dropped:
+            logger.debug(f"Відфільтровано повідомлень за правилами: {dict(dropped)}")
+        return kept
+    
+    def get_stats(self) -> Dict:
+        """Кількість перевірених та відкинутих кожним правилом повідомлень"""
+        return {
+            'checked': self.checked,
+            'dropped': {rule['name']: self.stats.get(rule['name'], 0) for rule in self.rules}
+        }
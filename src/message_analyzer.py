@@ -12,6 +12,9 @@ from dataclasses import dataclass
 from collections import defaultdict
 import logging
 
+from src.deduplicator import MessageDeduplicator
+from src.filter_rules import FilterRuleEngine
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,6 +28,9 @@ class Message:
     chat_id: int
     reply_to: Optional[int] = None
     forwarded_from: Optional[str] = None
+    template_id: Optional[int] = None  # ID шаблону, якщо текст повторюється
+    is_repeat: bool = False  # Повтор шаблону, що вже є в цій розмові
+    template_diff: Optional[str] = None  # Слова, відсутні в першому входженні шаблону
 
 
 @dataclass
@@ -38,6 +44,7 @@ class Conversation:
     total_messages: int
     manager_messages: int
     client_messages: int
+    duplicate_messages: int = 0
 
 
 class MessageProcessor:
@@ -49,13 +56,22 @@ class MessageProcessor:
     2. Групування повідомлень за датами
     3. Пошук ключових слів що вказують на обіцянки
     4. Визначення контексту розмови
-    5. Підготовка даних для AI
+    5. Виявлення шаблонних повідомлень, що повторюються
+    6. Підготовка даних для AI
     """
     
-    def __init__(self):
+    SCORE_CACHE_SIZE = 10000
+    TEMPLATE_MIN_LENGTH = 60  # Коротші повторення не згортаються: посилання на шаблон не коротше
+    
+    def __init__(self, deduplicate: bool = True, filter_rules: Optional[List[Dict]] = None,
+                 near_duplicates: bool = False):
         self.promise_keywords = self._load_promise_keywords()
         self.time_keywords = self._load_time_keywords()
         self.business_keywords = self._load_business_keywords()
+        self.filter_engine = FilterRuleEngine(filter_rules)
+        self.deduplicator = MessageDeduplicator() if deduplicate else None
+        self.near_duplicates = near_duplicates
+        self._score_cache: Dict[str, Dict] = {}
     
     def _load_promise_keywords(self) -> List[str]:
         """Ключові слова що вказують на обіцянки менеджера"""
@@ -110,7 +126,7 @@ class MessageProcessor:
         
         Args:
             raw_messages: Список сирих повідомлень з Telegram API
-            
+        
         Returns:
             Оброблений об'єкт Conversation
         """
@@ -123,6 +139,11 @@ class MessageProcessor:
         # Сортування за датою
         filtered_messages.sort(key=lambda x: x.date)
         
+        # Позначення повторів шаблонних повідомлень
+        duplicate_messages = 0
+        if self.deduplicator:
+            duplicate_messages = self._mark_duplicates(filtered_messages)
+        
         # Створення об'єкта розмови
         if filtered_messages:
             conversation = Conversation(
@@ -133,7 +154,8 @@ class MessageProcessor:
                 end_date=filtered_messages[-1].date,
                 total_messages=len(filtered_messages),
                 manager_messages=len([m for m in filtered_messages if m.from_me]),
-                client_messages=len([m for m in filtered_messages if not m.from_me])
+                client_messages=len([m for m in filtered_messages if not m.from_me]),
+                duplicate_messages=duplicate_messages
             )
         else:
             conversation = Conversation(
@@ -175,87 +197,116 @@ class MessageProcessor:
         """
         Фільтрація повідомлень від спаму та непотрібного контенту.
         
-        Видаляє:
-        - Системні повідомлення
+        Правила задаються конфігурацією (див. src/filter_rules.py), за
+        замовчуванням видаляються:
         - Дуже короткі повідомлення (менше 3 символів)
         - Повідомлення тільки з emoji
-        - Пересланні повідомлення (опціонально)
-        - Технічні повідомлення
+        - Системні повідомлення
+        - Спам (дуже довгі, з багатьма посиланнями чи великими літерами)
+        
+        Статистика відкинутих повідомлень доступна через filter_engine.get_stats().
+        """
+        return self.filter_engine.filter(messages)
+    
+    def _mark_duplicates(self, messages: List[Message]) -> int:
+        """
+        Позначення повторів шаблонних повідомлень.
+        
+        Розглядаються лише повідомлення від TEMPLATE_MIN_LENGTH символів:
+        коротші ("Дякую", "Добре") посилання на шаблон тільки подовжило б.
+        Повідомлення об'єднуються в шаблон лише від того самого відправника.
+        За замовчуванням шукаються дослівні повтори (без урахування регістру);
+        з near_duplicates=True повідомлення менеджера з ключовими словами
+        порівнюються ще й за MinHash, але лише за однакових знайдених
+        ключових слів, тож повтор не може приховати іншу обіцянку чи термін.
+        
+        Перше входження шаблону в розмові залишається повним, наступні
+        позначаються is_repeat і в тексті для AI замінюються посиланням
+        (разом зі словами, яких немає в першому входженні), якщо посилання
+        коротше за сам текст.
+        
+        Returns:
+            Кількість згорнутих повторів у розмові
         """
-        filtered = []
+        first_in_conversation: Dict[int, Message] = {}
+        repeats = 0
         
         for msg in messages:
-            # Пропуск порожніх повідомлень
-            if not msg.text or len(msg.text.strip()) < 3:
+            if len(msg.text) < self.TEMPLATE_MIN_LENGTH:
                 continue
             
-            # Пропуск повідомлень тільки з emoji
-            if self._is_only_emoji(msg.text):
-                continue
+            key = (msg.from_me,)
+            near_duplicates = False
+            if self.near_duplicates and msg.from_me:
+                # Скори повідомлень менеджера потрібні і для find_potential_promises,
+                # тож тут вони лише потрапляють у кеш
+                scores = self._score_message(msg.text)
+                if scores['total_score'] > 0:
+                    key = (True, scores['promise_score'], scores['time_score'],
+                           scores['business_score'],
+                           tuple(t['keyword'] for t in scores['extracted_times']))
+                    near_duplicates = True
+            template_id = self.deduplicator.assign(
+                msg.text, key=key, near_duplicates=near_duplicates
+            )
             
-            # Пропуск системних повідомлень
-            if self._is_system_message(msg.text):
+            first = first_in_conversation.get(template_id)
+            if first is None:
+                first_in_conversation[template_id] = msg
                 continue
             
-            # Пропуск спам повідомлень
-            if self._is_spam_message(msg.text):
+            # Для майже однакових повідомлень зберігаємо відмінні слова
+            first_words = set(first.text.lower().split())
+            diff = ' '.join(w for w in msg.text.split() if w.lower() not in first_words) or None
+            if len(self._repeat_reference(template_id, diff)) >= len(msg.text):
                 continue
             
-            filtered.append(msg)
-        
-        return filtered
+            first.template_id = template_id
+            msg.template_id = template_id
+            msg.is_repeat = True
+            msg.template_diff = diff
+            repeats += 1
+        
+        if repeats:
+            logger.info(f"Виявлено {repeats} повторів шаблонних повідомлень")
+        return repeats
     
-    def _is_only_emoji(self, text: str) -> bool:
-        """Перевірка чи містить текст тільки emoji"""
-        emoji_pattern = re.compile(
-            "["
-            "\U0001F600-\U0001F64F"  # emoticons
-            "\U0001F300-\U0001F5FF"  # symbols & pictographs
-            "\U0001F680-\U0001F6FF"  # transport & map symbols
-            "\U0001F1E0-\U0001F1FF"  # flags
-            "\U00002500-\U00002BEF"
-            "\U00002702-\U000027B0"
-            "\U000024C2-\U0001F251"
-            "\u2640-\u2642"
-            "\u2600-\u2B55"
-            "\u200d"
-            "\u23cf"
-            "\u23e9"
-            "\u231a"
-            "\ufe0f"
-            "\u3030"
-            "\s"  # пробіли
-            "]+"
-        )
-        
-        cleaned_text = emoji_pattern.sub('', text).strip()
-        return len(cleaned_text) == 0
+    @staticmethod
+    def _repeat_reference(template_id: int, template_diff: Optional[str]) -> str:
+        """Посилання на шаблон, яким у тексті для AI замінюється повтор"""
+        if template_diff:
+            return f"[повтор шаблону #{template_id}, відмінності: {template_diff}]"
+        return f"[повтор шаблону #{template_id}]"
     
-    def _is_system_message(self, text: str) -> bool:
-        """Перевірка системних повідомлень"""
-        system_patterns = [
-            r'приєднався до групи',
-            r'залишив групу',
-            r'змінив назву групи',
-            r'встановив фото групи',
-            r'видалив фото групи'
-        ]
-        
-        for pattern in system_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return True
+    def _score_message(self, text: str) -> Dict:
+        """
+        Скори та витягнуті обіцянки для тексту з кешуванням.
         
-        return False
-    
-    def _is_spam_message(self, text: str) -> bool:
-        """Перевірка спам повідомлень"""
-        spam_indicators = [
-            len(text) > 1000,  # Дуже довгі повідомлення
-            text.count('http') > 3,  # Багато посилань
-            len(re.findall(r'[A-Z]', text)) / len(text) > 0.7 if text else False,  # Багато великих літер
-        ]
+        Шаблонні повідомлення (прайси, привітання, статуси) повторюються
+        дослівно, тому їх аналіз виконується один раз.
+        """
+        cached = self._score_cache.get(text)
+        if cached is not None:
+            return cached
+        
+        extracted_times = self._extract_time_mentions(text)
+        promise_score = self._calculate_promise_score(text)
+        # Те саме, що _calculate_time_score: 2 бали за кожне знайдене часове слово
+        time_score = 2 * len(extracted_times)
+        business_score = self._calculate_business_score(text)
+        result = {
+            'promise_score': promise_score,
+            'time_score': time_score,
+            'business_score': business_score,
+            'total_score': promise_score + time_score + business_score,
+            'extracted_promises': self._extract_promise_text(text),
+            'extracted_times': extracted_times
+        }
         
-        return any(spam_indicators)
+        if len(self._score_cache) >= self.SCORE_CACHE_SIZE:
+            self._score_cache.clear()
+        self._score_cache[text] = result
+        return result
     
     def find_potential_promises(self, conversation: Conversation) -> List[Dict]:
         """
@@ -271,21 +322,17 @@ class MessageProcessor:
                 continue
             
             # Пошук ключових слів обіцянок
-            promise_score = self._calculate_promise_score(msg.text)
-            time_score = self._calculate_time_score(msg.text)
-            business_score = self._calculate_business_score(msg.text)
-            
-            total_score = promise_score + time_score + business_score
+            scores = self._score_message(msg.text)
             
-            if total_score > 2:  # Поріг для потенційної обіцянки
+            if scores['total_score'] > 2:  # Поріг для потенційної обіцянки
                 potential_promises.append({
                     'message': msg,
-                    'promise_score': promise_score,
-                    'time_score': time_score,
-                    'business_score': business_score,
-                    'total_score': total_score,
-                    'extracted_promises': self._extract_promise_text(msg.text),
-                    'extracted_times': self._extract_time_mentions(msg.text)
+                    'promise_score': scores['promise_score'],
+                    'time_score': scores['time_score'],
+                    'business_score': scores['business_score'],
+                    'total_score': scores['total_score'],
+                    'extracted_promises': scores['extracted_promises'],
+                    'extracted_times': scores['extracted_times']
                 })
         
         # Сортування за загальним скором
@@ -337,7 +384,8 @@ class MessageProcessor:
                 continue
             
             # Перевірка чи містить речення ключові слова обіцянок
-            if any(keyword in sentence.lower() for keyword in self.promise_keywords):
+            sentence_lower = sentence.lower()
+            if any(keyword in sentence_lower for keyword in self.promise_keywords):
                 promises.append(sentence)
         
         return promises
@@ -345,17 +393,17 @@ class MessageProcessor:
     def _extract_time_mentions(self, text: str) -> List[Dict]:
         """Витягування згадок часу"""
         time_mentions = []
+        text_lower = text.lower()
         
         for keyword in self.time_keywords:
-            if keyword in text.lower():
-                # Знаходимо позицію ключового слова
-                start_pos = text.lower().find(keyword)
-                if start_pos != -1:
-                    time_mentions.append({
-                        'keyword': keyword,
-                        'context': text[max(0, start_pos-20):start_pos+len(keyword)+20],
-                        'position': start_pos
-                    })
+            # Знаходимо позицію ключового слова
+            start_pos = text_lower.find(keyword)
+            if start_pos != -1:
+                time_mentions.append({
+                    'keyword': keyword,
+                    'context': text[max(0, start_pos-20):start_pos+len(keyword)+20],
+                    'position': start_pos
+                })
         
         return time_mentions
     
@@ -443,7 +491,15 @@ class MessageProcessor:
             sender = "Менеджер" if msg.from_me else "Клієнт"
             timestamp = msg.date.strftime("%Y-%m-%d %H:%M")
             
-            formatted_lines.append(f"[{timestamp}] {sender}: {msg.text}")
+            # Повтор шаблону замінюється посиланням на перше входження
+            if msg.is_repeat:
+                text = self._repeat_reference(msg.template_id, msg.template_diff)
+            elif msg.template_id is not None:
+                text = f"[шаблон #{msg.template_id}] {msg.text}"
+            else:
+                text = msg.text
+            
+            formatted_lines.append(f"[{timestamp}] {sender}: {text}")
         
         return "\n".join(formatted_lines)
     
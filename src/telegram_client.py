@@ -1,12 +1,17 @@
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from telethon.tl.types import User, Chat, Channel
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import asyncio
+import time
 
 class TelegramAnalyzer:
     def __init__(self, api_id, api_hash, phone):
         self.client = TelegramClient('session', api_id, api_hash)
         self.phone = phone
+        # Пауза між запитами при завантаженні історії, підлаштована
+        # під FloodWait; переходить від чату до чату
+        self.backfill_wait_time = 0.5
     
     async def connect(self):
         await self.client.start(phone=self.phone)
@@ -36,11 +41,182 @@ class TelegramAnalyzer:
             reverse=True
         ):
             if message.text:
-                messages.append({
-                    'id': message.id,
-                    'date': message.date,
-                    'text': message.text,
-                    'from_me': message.out,
-                    'chat_id': chat_id
-                })
-        return messages
\ No newline at end of file
+                messages.append(self._message_to_dict(message, chat_id))
+        return messages
+    
+    async def backfill_chat_history(self, chat_id, db, days_back=365, batch_size=1000,
+                                    wait_time=None, min_wait_time=0.5, max_wait_time=30.0):
+        """
+        Відновлюване завантаження історії чату у базу даних.
+        
+        Повідомлення читаються від найстаріших до найновіших і зберігаються
+        пачками по batch_size разом з контрольною точкою (ID останнього
+        обробленого повідомлення). Після збою чи перерваного запуску
+        завантаження продовжується з наступного після неї повідомлення.
+        
+        Повторний запуск для вже завантаженого чату довантажує нові
+        повідомлення. Якщо days_back охоплює раніший період, ніж попередній
+        запуск, спершу завантажується лише відсутній старіший відрізок, після
+        чого контрольна точка переходить до вже завантаженої частини.
+        
+        Кожна пачка читається окремим запитом iter_messages (з min_id, тож
+        продовження точне), щоб пауза між запитами діяла одразу: вона
+        подвоюється після кожного FloodWait і поступово зменшується до
+        min_wait_time після успішних пачок. Без wait_time береться пауза,
+        до якої дійшов попередній чат (backfill_wait_time).
+        
+        Returns:
+            Загальна кількість збережених повідомлень чату
+        """
+        # База зберігає дати з точністю до секунди, тому початок періоду
+        # округлюється одразу. offset_date виключний, тож цей запуск бере
+        # повідомлення після start_date, а розширення періоду - до gap_end_date
+        # включно, і повідомлення з тієї ж секунди не пропадає
+        requested_start = datetime.now(timezone.utc) - timedelta(days=days_back)
+        requested_start = requested_start.replace(microsecond=0)
+        checkpoint = db.get_backfill_checkpoint(chat_id)
+        
+        # Відрізок, уже завантажений попереднім запуском: пройшовши gap_end_date,
+        # завантаження переходить одразу до повідомлення gap_end_id
+        gap_end_date, gap_end_id = None, None
+        
+        if checkpoint:
+            start_date = _parse_utc(checkpoint['start_date'])
+            last_id = checkpoint['last_message_id']
+            last_date = _parse_utc(checkpoint['last_date']) if checkpoint['last_date'] else start_date
+            total_count = checkpoint['messages_count']
+            if checkpoint['gap_end_id']:
+                gap_end_date = _parse_utc(checkpoint['gap_end_date'])
+                gap_end_id = checkpoint['gap_end_id']
+            
+            if requested_start < start_date and gap_end_id is None:
+                print(f"Розширення періоду чату {chat_id}: завантаження з "
+                      f"{requested_start:%Y-%m-%d} до {start_date:%Y-%m-%d}")
+                if last_id:
+                    gap_end_date, gap_end_id = start_date, last_id
+                start_date = requested_start
+                last_id = 0
+                last_date = start_date
+            elif checkpoint['completed']:
+                print(f"Історія чату {chat_id} вже завантажена з {start_date:%Y-%m-%d}, "
+                      f"довантаження нових повідомлень після {last_id}")
+            else:
+                print(f"Продовження завантаження чату {chat_id} після повідомлення {last_id}")
+        else:
+            start_date = requested_start
+            last_id = 0
+            last_date = start_date
+            total_count = 0
+        
+        if wait_time is None:
+            wait_time = self.backfill_wait_time
+        resume_date = last_date
+        started = time.monotonic()
+        run_count = 0
+        
+        def save_batch(batch, completed=False):
+            nonlocal total_count, run_count
+            total_count += len(batch)
+            run_count += len(batch)
+            db.save_backfill_batch(chat_id, batch, {
+                'start_date': start_date,
+                'last_message_id': last_id,
+                'last_date': last_date,
+                'messages_count': total_count,
+                'completed': completed,
+                'gap_end_date': gap_end_date,
+                'gap_end_id': gap_end_id
+            })
+        
+        while True:
+            batch = []
+            processed = 0
+            reached_gap = False
+            try:
+                async for message in self.client.iter_messages(
+                    chat_id,
+                    limit=batch_size,
+                    offset_date=None if last_id else start_date,
+                    min_id=last_id,
+                    reverse=True,
+                    wait_time=wait_time
+                ):
+                    if gap_end_date is not None and message.date > gap_end_date:
+                        reached_gap = True
+                        break
+                    if message.text:
+                        batch.append(self._message_to_dict(message, chat_id))
+                    processed += 1
+                    last_id, last_date = message.id, message.date
+            except FloodWaitError as e:
+                # Зберігаємо вже отримане, щоб не завантажувати його повторно
+                save_batch(batch)
+                wait_time = min(max_wait_time, max(wait_time, min_wait_time) * 2)
+                print(f"FloodWait: очікування {e.seconds} с, нова пауза між запитами {wait_time:.1f} с")
+                await asyncio.sleep(e.seconds)
+                continue
+            
+            if reached_gap:
+                # Старіший відрізок завантажено, далі - з місця попереднього запуску
+                last_id = gap_end_id
+                gap_end_date, gap_end_id = None, None
+                save_batch(batch)
+                continue
+            
+            if processed < batch_size:
+                save_batch(batch, completed=True)
+                break
+            
+            save_batch(batch)
+            self._report_backfill_progress(
+                chat_id, run_count, started, start_date, resume_date, last_date
+            )
+            wait_time = max(min_wait_time, wait_time * 0.8)
+        
+        self.backfill_wait_time = wait_time
+        elapsed = time.monotonic() - started
+        print(f"Завантаження чату {chat_id} завершено: {total_count} повідомлень "
+              f"({run_count} за {elapsed:.0f} с)")
+        return total_count
+    
+    def _report_backfill_progress(self, chat_id, run_count, started,
+                                  start_date, resume_date, last_date):
+        """Виведення швидкості завантаження та орієнтовного часу до завершення"""
+        elapsed = time.monotonic() - started
+        rate = run_count / elapsed if elapsed > 0 else 0.0
+        now = datetime.now(timezone.utc)
+        
+        # Прогрес оцінюється за датою останнього повідомлення відносно періоду,
+        # а ETA - лише за частиною, пройденою в поточному запуску
+        progress = _period_fraction(start_date, last_date, now)
+        run_progress = _period_fraction(resume_date, last_date, now)
+        if run_progress > 0:
+            eta_text = str(timedelta(seconds=int(elapsed * (1 - run_progress) / run_progress)))
+        else:
+            eta_text = "невідомо"
+        
+        print(f"Чат {chat_id}: {run_count} повідомлень, {rate:.1f} повідомлень/с, "
+              f"прогрес {progress * 100:.1f}%, залишилось ~{eta_text}")
+    
+    def _message_to_dict(self, message, chat_id):
+        """Перетворення повідомлення Telethon у словник"""
+        return {
+            'id': message.id,
+            'date': message.date,
+            'text': message.text,
+            'from_me': message.out,
+            'chat_id': chat_id
+        }
+
+
+def _period_fraction(start, current, end):
+    """Частка періоду від start до end, пройдена до current"""
+    period = (end - start).total_seconds()
+    if period <= 0:
+        return 1.0
+    return min(max((current - start).total_seconds() / period, 0.0), 1.0)
+
+
+def _parse_utc(value):
+    """Розбір дати з бази даних (збереженої в UTC)"""
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
\ No newline at end of file